@@ -5,6 +5,7 @@ import pandas as pd
 import os
 import datetime
 import argparse
+import shutil
 
 # Parse input arguments
 parser = argparse.ArgumentParser("parallel run step results directory")
@@ -15,30 +16,46 @@ parser.add_argument("--target_column", type=str, help="column with actual values
 parser.add_argument("--timestamp_column", type=str, help="timestamp column from data", required=True)
 parser.add_argument("--timeseries_id_columns", type=str, nargs='*', required=True,
                     help="input columns identifying the timeseries")
+parser.add_argument("--output_format", type=str, choices=['text', 'parquet'], default='text',
+                    help="output format used by the forecasting step")
 # add list for the columns to pull ?
 
 args, _ = parser.parse_known_args()
 
-result_file = os.path.join(args.parallel_run_step_output, 'parallel_run_step.txt')
-
-# Read the log file and set the column names from the input timeseries schema
-# The parallel run step log does not have a header row, so add it for easier downstream processing
-df_predictions = pd.read_csv(result_file, delimiter=" ", header=None)
-pred_column_names = [args.timestamp_column, 'Prediction']
-if args.target_column is not None:
-    pred_column_names.append(args.target_column)
-pred_column_names.extend(args.timeseries_id_columns)
-print('Using column names: {}'.format(pred_column_names))
-assert len(df_predictions.columns) == len(pred_column_names), \
-    'Number of columns in prediction data does not match given timeseries schema.'
-df_predictions.columns = pred_column_names
-
-# Save the log file
+# Make a unique output path for this run
 output_path = os.path.join(args.output_dir, 'forecasts_' + str(datetime.datetime.now().date()))
 counter = 0
-while os.path.exists(output_path + '.csv'):
+while os.path.exists(output_path + '.csv') or os.path.exists(output_path):
     output_path += '_' + str(counter)
     counter += 1
 
-df_predictions.to_csv(output_path + '.csv', index=False)
-print('Saved the forecasting results to a csv')
+result_file = os.path.join(args.parallel_run_step_output, 'parallel_run_step.txt')
+
+if args.output_format == 'parquet':
+    # The forecasting step already wrote typed, headered Parquet shards, so copy them as-is
+    # Keeping the shards separate lets downstream consumers read the predictions in parallel
+    # Only the shards listed in the manifest are copied; a shard listed more than once is copied once
+    df_manifest = pd.read_csv(result_file, delimiter=" ", header=None, names=['shard', 'num_series', 'num_rows'])
+    df_manifest = df_manifest.drop_duplicates(subset=['shard'])
+    assert len(df_manifest) > 0, 'No prediction shards found in the parallel run step output.'
+    os.makedirs(output_path)
+    for shard in df_manifest['shard']:
+        shutil.copy(os.path.join(args.parallel_run_step_output, shard), output_path)
+    print('Copied {} forecasting result shards ({} series) to {}'.format(
+        len(df_manifest), df_manifest['num_series'].sum(), output_path))
+else:
+    # Read the log file and set the column names from the input timeseries schema
+    # The parallel run step log does not have a header row, so add it for easier downstream processing
+    df_predictions = pd.read_csv(result_file, delimiter=" ", header=None)
+    pred_column_names = [args.timestamp_column, 'Prediction']
+    if args.target_column is not None:
+        pred_column_names.append(args.target_column)
+    pred_column_names.extend(args.timeseries_id_columns)
+    print('Using column names: {}'.format(pred_column_names))
+    assert len(df_predictions.columns) == len(pred_column_names), \
+        'Number of columns in prediction data does not match given timeseries schema.'
+    df_predictions.columns = pred_column_names
+
+    # Save the log file
+    df_predictions.to_csv(output_path + '.csv', index=False)
+    print('Saved the forecasting results to a csv')
@@ -2,6 +2,8 @@
 # Licensed under the MIT License.
 
 import argparse
+import hashlib
+import os
 import joblib
 import pandas as pd
 
@@ -16,19 +18,77 @@ parser.add_argument("--timestamp_column", type=str, help="timestamp column from
 parser.add_argument("--timeseries_id_columns", type=str, nargs='*', required=True,
                     help="input columns identifying the timeseries")
 parser.add_argument("--model_type", type=str, help="model type", required=True)
+parser.add_argument("--forecast_strategy", type=str, choices=['recursive', 'direct'], default=None,
+                    help="strategy for forecasting beyond one step ahead, defaults to the strategy used in training")
+parser.add_argument("--panel_store_data_dir", type=str, default=None,
+                    help="mounted input directory to parse once per node and share between worker processes")
+parser.add_argument("--panel_store_dir", type=str, default=None,
+                    help="node-local directory for the panel store, defaults to /dev/shm")
+parser.add_argument("--output_format", type=str, choices=['text', 'parquet'], default='text',
+                    help="'text' returns predictions to parallel_run_step.txt, "
+                         "'parquet' writes one Parquet shard per mini-batch and returns a manifest row")
 
 args, _ = parser.parse_known_args()
 
 current_run = None
+panel_store = None
+shard_dir = None
 
 
 def init():
-    global current_run
+    global current_run, panel_store, shard_dir
     current_run = Run.get_context()
 
     # set the current run trait to be inference run
     set_telemetry_scenario(current_run, 'ManyModelsCustomScriptInference')
 
+    # Set up the node-level panel store if requested
+    # The store is built by the first worker on the node and removed by the last one to shut down
+    # If the store cannot be built, the worker falls back to reading its CSV files
+    if args.panel_store_data_dir is not None:
+        from panel_store import PanelStore
+        panel_store = PanelStore(current_run.id, args.panel_store_data_dir, args.timestamp_column,
+                                 store_dir=args.panel_store_dir)
+        try:
+            panel_store.attach()
+        except Exception as e:
+            print('exception happened during building the panel store {}'.format(e))
+            panel_store = None
+
+    # Set up the shard directory in the step output when writing Parquet output
+    if args.output_format == 'parquet':
+        from azureml_user.parallel_run import EntryScript
+        shard_dir = os.path.join(EntryScript().output_dir, 'predictions')
+        os.makedirs(shard_dir, exist_ok=True)
+
+
+def shutdown():
+    if panel_store is not None:
+        panel_store.close()
+
+
+def write_prediction_shard(predictions, input_data):
+    """
+    Write the predictions for a mini-batch to a Parquet shard and return a manifest row for it.
+    The shard is named by a hash of the mini-batch's input files, so a retried mini-batch overwrites
+    its earlier shard instead of adding a duplicate.
+    Rows are sorted by timeseries id and time so each series is stored contiguously in the shard.
+    """
+    input_names = '\n'.join(sorted(os.path.basename(path) for path in input_data))
+    shard_name = 'predictions_{}.parquet'.format(hashlib.sha256(input_names.encode()).hexdigest()[:32])
+
+    predictions = predictions.sort_values(args.timeseries_id_columns + [args.timestamp_column])
+    shard_path = os.path.join(shard_dir, shard_name)
+    # Write to a temporary file first so that a killed mini-batch never leaves a partial shard behind
+    tmp_path = '{}.{}.tmp'.format(shard_path, os.getpid())
+    predictions.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, shard_path)
+
+    # The shard path is relative to the step output directory so the copy step can resolve it on its own mount
+    num_series = len(predictions.drop_duplicates(subset=args.timeseries_id_columns))
+    return pd.DataFrame([{'shard': 'predictions/' + shard_name, 'num_series': num_series,
+                          'num_rows': len(predictions)}])
+
 
 def run(input_data):
     # 1.0 Set up results dataframe
@@ -38,8 +98,11 @@ def run(input_data):
     for csv_file_path in input_data:
 
         # 3.0 Set up data to predict on
-        data = (pd.read_csv(csv_file_path, parse_dates=[args.timestamp_column], header=0)
-                .set_index(args.timestamp_column))
+        if panel_store is not None:
+            data = panel_store.read_series(csv_file_path)
+        else:
+            data = (pd.read_csv(csv_file_path, parse_dates=[args.timestamp_column], header=0)
+                    .set_index(args.timestamp_column))
 
         # 4.0 Load registered model from Workspace
         ts_id_dict = {id_col: str(data[id_col].iloc[0]) for id_col in args.timeseries_id_columns}
@@ -53,7 +116,7 @@ def run(input_data):
         forecaster = joblib.load(model_path)
 
         # 5.0 Make predictions
-        forecasts = forecaster.forecast(data)
+        forecasts = forecaster.forecast(data, forecast_strategy=args.forecast_strategy)
         prediction_df = forecasts.to_frame(name='Prediction')
 
         # 6.0 Add actuals to the returned dataframe if they are available
@@ -61,7 +124,14 @@ def run(input_data):
             prediction_df[forecaster.target_column_name] = data[forecaster.target_column_name]
 
         # 7.0 Add the timeseries id columns and append the dataframe to the return list
+        # Parquet shards keep the original id column types; the string values are only needed for model tags
+        if args.output_format == 'parquet':
+            ts_id_dict = {id_col: data[id_col].iloc[0] for id_col in args.timeseries_id_columns}
         results.append(prediction_df.reset_index().assign(**ts_id_dict))
 
     # Data returned by this function will be available in parallel_run_step.txt
-    return pd.concat(results)
+    # In parquet mode only the shard manifest is returned; the predictions themselves are in the shard
+    predictions = pd.concat(results)
+    if args.output_format == 'parquet':
+        return write_prediction_shard(predictions, input_data)
+    return predictions
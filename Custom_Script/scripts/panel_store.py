@@ -0,0 +1,189 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+import atexit
+import fcntl
+import json
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+
+
+class PanelStore:
+    """
+    Node-level store for the input panel, shared by all worker processes on a node.
+    The first worker to attach parses every CSV file under the input directory once and writes the
+    panel to an Arrow IPC file in node-local storage, one record batch per file, with an index
+    from the file path relative to the input directory to its batch.
+    Every worker then memory-maps the Arrow file and reads its series without re-parsing CSVs;
+    numeric and timestamp columns are zero-copy views on the shared mapping.
+
+    Each node builds the store from the whole input directory, since the files a node will process
+    are not known in advance. With more than one node this parses every file once per node rather
+    than once per job, so the store only pays off when the step runs on a single node.
+
+    Input files that do not share the schema of the first file are read from CSV instead.
+    Attached workers are recorded by process id; the last live worker to close the store removes it.
+    """
+
+    def __init__(self, store_name, data_dir, timestamp_column, store_dir=None):
+        if store_dir is None:
+            # Prefer shared memory so the panel is held in RAM once per node
+            store_dir = '/dev/shm' if os.path.isdir('/dev/shm') else '/tmp'
+        self.store_path = os.path.join(store_dir, 'many_models_panel_' + store_name)
+        self.data_dir = os.path.abspath(data_dir)
+        self.timestamp_column = timestamp_column
+
+        self._panel_file = os.path.join(self.store_path, 'panel.arrow')
+        self._index_file = os.path.join(self.store_path, 'index.json')
+        self._pids_file = os.path.join(self.store_path, 'pids.json')
+        self._lock_file = os.path.join(self.store_path, 'store.lock')
+        self._failed_file = os.path.join(self.store_path, 'failed')
+        self._reader = None
+        self._index = None
+
+    def _locked(self):
+        """
+        Open and lock the node-wide lock file for the store.
+        The caller holds the lock until the returned file is closed.
+        """
+        while True:
+            os.makedirs(self.store_path, exist_ok=True)
+            lock = open(self._lock_file, 'a')
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # The store may have been removed while waiting for the lock; if so, lock the new file instead
+            try:
+                if os.fstat(lock.fileno()).st_ino == os.stat(self._lock_file).st_ino:
+                    return lock
+            except FileNotFoundError:
+                pass
+            lock.close()
+
+    def _read_csv(self, csv_file_path):
+        return pd.read_csv(csv_file_path, parse_dates=[self.timestamp_column], header=0)
+
+    def _live_pids(self):
+        """
+        Get the ids of attached processes that are still running.
+        Workers killed by a timeout or crash never close the store, so they are dropped here.
+        """
+        pids = []
+        if os.path.exists(self._pids_file):
+            with open(self._pids_file) as f:
+                pids = json.load(f)
+
+        live_pids = []
+        for pid in pids:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                continue
+            except PermissionError:
+                pass
+            live_pids.append(pid)
+        return live_pids
+
+    def _write_pids(self, pids):
+        with open(self._pids_file, 'w') as f:
+            json.dump(pids, f)
+
+    def _build(self):
+        """
+        Write every CSV file under the input directory to the Arrow file and the relative path index.
+        Files that do not match the schema of the first file are left out of the store and read from CSV.
+        """
+        file_paths = sorted(os.path.relpath(os.path.join(path, f), self.data_dir)
+                            for path, _, files in os.walk(self.data_dir) for f in files
+                            if f.lower().endswith('.csv'))
+        assert len(file_paths) > 0, 'No CSV files found in {}'.format(self.data_dir)
+
+        index = {}
+        schema = None
+        writer = None
+        tmp_file = self._panel_file + '.tmp'
+        try:
+            for file_path in file_paths:
+                data = self._read_csv(os.path.join(self.data_dir, file_path))
+                if schema is None:
+                    schema = pa.Schema.from_pandas(data, preserve_index=False)
+                    writer = pa.ipc.new_file(tmp_file, schema)
+                try:
+                    batch = pa.RecordBatch.from_pandas(data, schema=schema, preserve_index=False)
+                except pa.ArrowException as e:
+                    print('Leaving {} out of the panel store: {}'.format(file_path, e))
+                    continue
+                index[file_path] = len(index)
+                writer.write_batch(batch)
+            writer.close()
+            writer = None
+
+            with open(self._index_file, 'w') as f:
+                json.dump(index, f)
+            # Publish the panel last so that a partially written store is never used
+            os.replace(tmp_file, self._panel_file)
+        finally:
+            if writer is not None:
+                writer.close()
+            # Remove the partial panel on failure so it does not hold shared memory
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def attach(self):
+        """
+        Attach the current process to the store, building it if this is the first worker on the node.
+        Call this from init() so the build does not count against the run() invocation timeout.
+        If the build fails, a marker is left in the store so that other workers do not retry it.
+        """
+        if self._reader is not None:
+            return
+
+        with self._locked():
+            assert not os.path.exists(self._failed_file), \
+                'Building panel store {} failed in another worker'.format(self.store_path)
+            if not os.path.exists(self._panel_file):
+                print('Building panel store {} from {}'.format(self.store_path, self.data_dir))
+                try:
+                    self._build()
+                except Exception:
+                    open(self._failed_file, 'w').close()
+                    raise
+            self._write_pids(self._live_pids() + [os.getpid()])
+
+        with open(self._index_file) as f:
+            self._index = json.load(f)
+        self._reader = pa.ipc.open_file(pa.memory_map(self._panel_file, 'r'))
+        # Detach on a normal interpreter exit even if shutdown() is never called
+        atexit.register(self.close)
+
+    def read_series(self, csv_file_path):
+        """
+        Get the data for the given input file with the time in the index.
+        Files that are not under the input directory or not in the store are read from CSV.
+        """
+        file_path = os.path.relpath(os.path.abspath(csv_file_path), self.data_dir)
+        if self._reader is not None and file_path in self._index:
+            batch = self._reader.get_record_batch(self._index[file_path])
+            data = pa.Table.from_batches([batch]).to_pandas(split_blocks=True)
+        else:
+            data = self._read_csv(csv_file_path)
+        return data.set_index(self.timestamp_column)
+
+    def close(self):
+        """
+        Detach the current process from the store and remove the store if no other live worker is attached.
+        """
+        if self._reader is None:
+            return
+        self._reader = None
+        self._index = None
+
+        with self._locked():
+            pids = [pid for pid in self._live_pids() if pid != os.getpid()]
+            if len(pids) > 0:
+                self._write_pids(pids)
+            else:
+                # The lock file is inside the store, so it is removed along with it
+                print('Removing panel store {}'.format(self.store_path))
+                shutil.rmtree(self.store_path, ignore_errors=True)
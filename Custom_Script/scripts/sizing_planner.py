@@ -0,0 +1,171 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+import argparse
+import csv
+import heapq
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+# Format of str(datetime.timedelta), e.g. '0:03:00.123456' or '1 day, 2:03:00'
+DURATION_PATTERN = re.compile(r'^(-?\d+ days?, )?\d+:\d{2}:\d{2}(\.\d+)?$')
+
+
+def load_durations(result_file):
+    """
+    Read the per-series durations, in seconds, from the parallel_run_step.txt written by train.py.
+    The file has no header and a variable number of timeseries id columns, and id values may contain
+    spaces, so the duration is located by its position from the end of each row.
+    """
+    with open(result_file, newline='') as f:
+        rows = [row for row in csv.reader(f, delimiter=' ') if len(row) > 0]
+
+    # train.py writes duration, mse, rmse, mae, mape, index, num_models, status and run_id at the end of each row
+    duration_values = []
+    for line_number, row in enumerate(rows, start=1):
+        if len(row) < 9 or not DURATION_PATTERN.match(row[-9]):
+            raise ValueError('Expected an H:MM:SS duration as the 9th last field on line {} of {}, found {}. '
+                             'The column order of the training results may have changed.'
+                             .format(line_number, result_file, row[-9] if len(row) >= 9 else row))
+        duration_values.append(row[-9])
+    durations = pd.to_timedelta(pd.Series(duration_values, dtype=str)).dt.total_seconds()
+    return durations.values
+
+
+def simulate_makespan(durations, node_count, process_count_per_node, mini_batch_size, batch_overhead=0.0):
+    """
+    Simulate a ParallelRunStep run and return the predicted makespan in seconds.
+    The series are split into mini-batches in order and each batch goes to the next idle worker process.
+    batch_overhead is a fixed cost in seconds added to every mini-batch for scheduling and run() set up.
+    """
+    batch_durations = [np.sum(durations[i:i + mini_batch_size]) + batch_overhead
+                       for i in range(0, len(durations), mini_batch_size)]
+
+    # Min-heap of the times at which each worker process becomes idle
+    workers = [0.0] * (node_count * process_count_per_node)
+    for batch_duration in batch_durations:
+        heapq.heapreplace(workers, workers[0] + batch_duration)
+    return max(workers)
+
+
+def evaluate_configurations(durations, series_count=None, max_nodes=10, cores_per_node=8,
+                            mini_batch_sizes=(1, 2, 5, 10, 20), batch_overhead=1.0,
+                            timeout_safety_factor=1.5, seed=0):
+    """
+    Simulate every combination of node count, processes per node and mini-batch size.
+    If series_count differs from the number of measured durations, the durations are resampled to
+    series_count series. Series are shuffled since the order of files in a run is not known in advance.
+
+    Returns a DataFrame with the predicted makespan, utilization and node hours of each configuration
+    along with a run_invocation_timeout that covers the slowest possible mini-batch.
+    """
+    durations = np.asarray(durations, dtype=float)
+    assert len(durations) > 0, 'Expected at least one measured duration'
+    assert len(mini_batch_sizes) > 0, 'Expected at least one mini-batch size'
+    rng = np.random.default_rng(seed)
+    if series_count is not None and series_count != len(durations):
+        durations = rng.choice(durations, size=series_count, replace=True)
+    else:
+        durations = rng.permutation(durations)
+    total_work = np.sum(durations)
+    longest_first = np.sort(durations)[::-1]
+
+    results = []
+    for mini_batch_size in mini_batch_sizes:
+        # The timeout must cover a mini-batch made up of the slowest series
+        slowest_batch = np.sum(longest_first[:mini_batch_size]) + batch_overhead
+        timeout = max(60, int(math.ceil(slowest_batch * timeout_safety_factor)))
+        for node_count in range(1, max_nodes + 1):
+            for process_count_per_node in range(1, cores_per_node + 1):
+                makespan = simulate_makespan(durations, node_count, process_count_per_node, mini_batch_size,
+                                             batch_overhead=batch_overhead)
+                results.append({'node_count': node_count,
+                                'process_count_per_node': process_count_per_node,
+                                'mini_batch_size': mini_batch_size,
+                                'run_invocation_timeout': timeout,
+                                'makespan': makespan,
+                                'utilization': total_work / (node_count * process_count_per_node * makespan),
+                                'node_hours': node_count * makespan / 3600})
+    return pd.DataFrame(results)
+
+
+def plan_parallel_run_config(durations, target_makespan=None, budget_node_hours=None, **kwargs):
+    """
+    Recommend ParallelRunConfig settings from measured per-series durations.
+    Give either target_makespan, in seconds, to get the cheapest configuration that finishes in time,
+    or budget_node_hours to get the fastest configuration within budget.
+    Other keyword arguments are passed to evaluate_configurations.
+
+    Returns a dict with the recommended node_count, process_count_per_node, mini_batch_size and
+    run_invocation_timeout, the predicted makespan, utilization and node hours, and whether the
+    target or budget is met. If no configuration meets it, the closest configuration is returned.
+    """
+    assert (target_makespan is None) != (budget_node_hours is None), \
+        'Expected exactly one of target_makespan and budget_node_hours'
+    candidates = evaluate_configurations(durations, **kwargs)
+
+    # Prefer fewer nodes and processes among otherwise equal configurations
+    if target_makespan is not None:
+        meets = candidates['makespan'] <= target_makespan
+        order = ['node_hours', 'makespan', 'node_count', 'process_count_per_node']
+        fallback = ['makespan', 'node_hours', 'node_count', 'process_count_per_node']
+    else:
+        meets = candidates['node_hours'] <= budget_node_hours
+        order = ['makespan', 'node_hours', 'node_count', 'process_count_per_node']
+        fallback = ['node_hours', 'makespan', 'node_count', 'process_count_per_node']
+
+    if meets.any():
+        best = candidates[meets].sort_values(order).iloc[0]
+    else:
+        best = candidates.sort_values(fallback).iloc[0]
+
+    return {'node_count': int(best['node_count']),
+            'process_count_per_node': int(best['process_count_per_node']),
+            # ParallelRunConfig expects the mini-batch size as a string
+            'mini_batch_size': str(int(best['mini_batch_size'])),
+            'run_invocation_timeout': int(best['run_invocation_timeout']),
+            'makespan': best['makespan'],
+            'utilization': best['utilization'],
+            'node_hours': best['node_hours'],
+            'meets_target': bool(meets.any())}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser("sizing planner")
+    parser.add_argument("--parallel_run_step_output", type=str, required=True,
+                        help="parallel_run_step.txt from a previous training run")
+    parser.add_argument("--series_count", type=int, default=None,
+                        help="number of series to plan for, defaults to the number of measured series")
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument("--target_makespan", type=float, help="target wall-clock time in seconds")
+    target_group.add_argument("--budget_node_hours", type=float, help="budget in node hours")
+    parser.add_argument("--max_nodes", type=int, default=10, help="maximum number of nodes in the cluster")
+    parser.add_argument("--cores_per_node", type=int, default=8, help="number of cores on each node")
+    parser.add_argument("--mini_batch_sizes", type=int, nargs='+', default=[1, 2, 5, 10, 20],
+                        help="mini-batch sizes to consider")
+    parser.add_argument("--batch_overhead", type=float, default=1.0,
+                        help="fixed cost in seconds of each mini-batch")
+
+    args = parser.parse_args()
+
+    plan = plan_parallel_run_config(load_durations(args.parallel_run_step_output),
+                                    target_makespan=args.target_makespan,
+                                    budget_node_hours=args.budget_node_hours,
+                                    series_count=args.series_count,
+                                    max_nodes=args.max_nodes,
+                                    cores_per_node=args.cores_per_node,
+                                    mini_batch_sizes=args.mini_batch_sizes,
+                                    batch_overhead=args.batch_overhead)
+
+    if not plan['meets_target']:
+        print('No configuration meets the target; showing the closest configuration.')
+    print('node_count: {}'.format(plan['node_count']))
+    print('process_count_per_node: {}'.format(plan['process_count_per_node']))
+    print('mini_batch_size: {}'.format(plan['mini_batch_size']))
+    print('run_invocation_timeout: {}'.format(plan['run_invocation_timeout']))
+    print('Predicted makespan: {:.0f} seconds'.format(plan['makespan']))
+    print('Predicted utilization: {:.1%}'.format(plan['utilization']))
+    print('Predicted node hours: {:.2f}'.format(plan['node_hours']))
@@ -3,7 +3,7 @@
 
 import numpy as np
 import pandas as pd
-from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.base import BaseEstimator, TransformerMixin, clone
 from sklearn.pipeline import Pipeline
 
 
@@ -158,23 +158,74 @@ class SimpleForecaster(TransformerMixin):
     Forecasting class for a simple, 1-step ahead forecaster.
     This class encapsulates fitting a transform pipeline with an sklearn regression estimator
     and producing in-sample and out-of-sample forecasts.
-    Out-of-sample forecasts apply the model recursively over the prediction set to produce forecasts
-    at any horizon.
+    With the 'recursive' strategy, out-of-sample forecasts apply the model recursively over the
+    prediction set to produce forecasts at any horizon.
+    With the 'direct' strategy, a multi-output copy of the estimator is also fit on horizon-shifted
+    targets for h = 1..max_horizon, so out-of-sample forecasts up to max_horizon come from a single
+    prediction on the featurized forecast origin.
 
     The forecaster assumes that the time-series data is regularly sampled on a contiguous interval;
     it does not handle missing values.
     """
 
-    def __init__(self, transform_steps, estimator, target_column_name, time_column_name):
+    def __init__(self, transform_steps, estimator, target_column_name, time_column_name,
+                 forecast_strategy='recursive', max_horizon=None):
         assert estimator is not None, "Estimator cannot be None."
         assert transform_steps is None or isinstance(transform_steps, list), \
             "transform_steps should be a list"
+        assert forecast_strategy in ('recursive', 'direct'), \
+            "forecast_strategy should be either 'recursive' or 'direct'"
+        assert forecast_strategy != 'direct' or (isinstance(max_horizon, int) and max_horizon > 0), \
+            "The direct forecast strategy requires max_horizon to be an integer greater than zero"
         estimator_step = ('estimator', SklearnWrapper(estimator, target_column_name))
         steps = transform_steps + [estimator_step] if transform_steps is not None else [estimator_step]
         self.pipeline = Pipeline(steps=steps)
 
         self.target_column_name = target_column_name
         self.time_column_name = time_column_name
+        self.forecast_strategy = forecast_strategy
+        self.max_horizon = max_horizon
+
+    def _featurize(self, X):
+        """
+        Run the input through the transform steps of the pipeline.
+        Returns the feature frame in the column order expected by the estimator, along with the target.
+        """
+        X_feat = self.pipeline[:-1].transform(X)
+        column_order = self.pipeline.named_steps['estimator']._column_order
+        y = X_feat[self.target_column_name] if self.target_column_name in X_feat.columns else None
+        return X_feat[column_order], y
+
+    def _fit_direct(self, X):
+        """
+        Fit the direct multi-horizon model.
+        The target for horizon h on each row is the target value h - 1 steps after that row,
+        so all horizons share one featurized matrix and are fit together as a multi-output regression.
+        """
+        features, y = self._featurize(X.sort_index(ascending=True))
+        targets = pd.concat([y.shift(-(h - 1)) for h in range(1, self.max_horizon + 1)], axis=1)
+        valid = features.notna().all(axis=1) & targets.notna().all(axis=1)
+        assert valid.sum() > 0, \
+            'Training dataframe is empty after building targets for {} horizons'.format(self.max_horizon)
+
+        sklearn_model = self.pipeline.named_steps['estimator'].sklearn_model
+        self._direct_model = clone(sklearn_model).fit(features[valid].values, targets[valid].values)
+
+    def _direct_forecast(self, X):
+        """
+        Apply the direct multi-horizon model for out-of-sample predictions.
+        All horizons are predicted at once from the features of the first forecast date.
+        Dates beyond max_horizon cannot be forecast and are returned as np.nan.
+        """
+        X_fcst = X.sort_index(ascending=True)
+        features, _ = self._featurize(X_fcst)
+        assert features.iloc[0].notna().all(), 'Features for the first forecast date contain missing values'
+        y_raw = self._direct_model.predict(features.iloc[[0]].values).reshape(-1)
+
+        forecasts = pd.Series(np.nan, index=X_fcst.index)
+        num_horizons = min(len(X_fcst), self.max_horizon)
+        forecasts.iloc[:num_horizons] = y_raw[:num_horizons]
+        return forecasts
 
     def _recursive_forecast(self, X):
         """
@@ -206,6 +257,8 @@ class SimpleForecaster(TransformerMixin):
             "Expected time column to comprise input dataframe index."
         self._latest_training_date = X.index.max()
         self.pipeline.fit(X)
+        if self.forecast_strategy == 'direct':
+            self._fit_direct(X)
         return self
 
     def transform(self, X):
@@ -214,17 +267,25 @@ class SimpleForecaster(TransformerMixin):
         """
         return self.pipeline.transform(X)
 
-    def forecast(self, X):
+    def forecast(self, X, forecast_strategy=None):
         """
         Make forecasts over the prediction frame, X.
         X can contain in-sample and out-of-sample data.
-        For out-of-sample data, the 1-step-ahead model is recursively applied.
+        For out-of-sample data, the 1-step-ahead model is recursively applied or, with the 'direct'
+        strategy, the multi-horizon model is applied. forecast_strategy defaults to the strategy
+        the forecaster was created with.
 
         Returns forecasts for the target in a pd.Series object with the same time index as X.
         np.nan values will be returned for dates where a forecast could not be found.
         """
         assert list(X.index.names) == [self.time_column_name], \
             "Expected time column to comprise input dataframe index."
+        # Forecasters saved before the direct strategy was added do not have the attribute
+        if forecast_strategy is None:
+            forecast_strategy = getattr(self, 'forecast_strategy', 'recursive')
+        assert forecast_strategy == 'recursive' or hasattr(self, '_direct_model'), \
+            "The direct forecast strategy requires a forecaster fit with forecast_strategy='direct'"
+
         # Get in-sample forecasts if requested
         X_insamp = X[X.index <= self._latest_training_date]
         forecasts_insamp = pd.Series()
@@ -235,8 +296,11 @@ class SimpleForecaster(TransformerMixin):
         X_fcst = X[X.index > self._latest_training_date]
         forecasts = pd.Series()
         if len(X_fcst) > 0:
-            # Need to iterate/recurse 1-step forecasts here
-            forecasts = self._recursive_forecast(X_fcst)
+            if forecast_strategy == 'direct':
+                forecasts = self._direct_forecast(X_fcst)
+            else:
+                # Need to iterate/recurse 1-step forecasts here
+                forecasts = self._recursive_forecast(X_fcst)
         forecasts = pd.concat((forecasts_insamp, forecasts))
 
         return forecasts.reindex(X.index)
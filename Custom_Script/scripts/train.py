@@ -25,18 +25,50 @@ parser.add_argument("--drop_columns", type=str, nargs='*', default=[],
                     help="list of columns to drop prior to modeling")
 parser.add_argument("--model_type", type=str, required=True, help="input model type")
 parser.add_argument("--test_size", type=int, required=True, help="number of observations to be used for testing")
+parser.add_argument("--forecast_strategy", type=str, choices=['recursive', 'direct'], default='recursive',
+                    help="strategy for forecasting beyond one step ahead")
+parser.add_argument("--max_horizon", type=int, default=None,
+                    help="maximum forecast horizon for the direct strategy, defaults to test_size")
+parser.add_argument("--panel_store_data_dir", type=str, default=None,
+                    help="mounted input directory to parse once per node and share between worker processes")
+parser.add_argument("--panel_store_dir", type=str, default=None,
+                    help="node-local directory for the panel store, defaults to /dev/shm")
 
 args, _ = parser.parse_known_args()
 
+# The direct forecaster cannot forecast the test set beyond its maximum horizon
+if args.forecast_strategy == 'direct' and args.max_horizon is not None and args.max_horizon < args.test_size:
+    parser.error('--max_horizon ({}) must be at least --test_size ({}) for the direct forecast strategy'
+                 .format(args.max_horizon, args.test_size))
+
 current_run = None
+panel_store = None
 
 
 def init():
-    global current_run
+    global current_run, panel_store
     current_run = Run.get_context()
     # Update step run with the right traits to denote it is training
     set_telemetry_scenario(current_run, 'ManyModelsCustomScriptTrain')
 
+    # Set up the node-level panel store if requested
+    # The store is built by the first worker on the node and removed by the last one to shut down
+    # If the store cannot be built, the worker falls back to reading its CSV files
+    if args.panel_store_data_dir is not None:
+        from panel_store import PanelStore
+        panel_store = PanelStore(current_run.id, args.panel_store_data_dir, args.timestamp_column,
+                                 store_dir=args.panel_store_dir)
+        try:
+            panel_store.attach()
+        except Exception as e:
+            print('exception happened during building the panel store {}'.format(e))
+            panel_store = None
+
+
+def shutdown():
+    if panel_store is not None:
+        panel_store.close()
+
 
 def set_telemetry(run):
     prop = {"azureml.runsource": "azureml.ManyModelsCustomTrain"}
@@ -61,9 +93,12 @@ def run(input_data):
         model_name = args.model_type + '_' + file_name
 
         # 1.0 Read the data from CSV - parse timestamps as datetime type and put the time in the index
-        data = (pd.read_csv(csv_file_path, parse_dates=[args.timestamp_column], header=0)
-                .set_index(args.timestamp_column)
-                .sort_index(ascending=True))
+        if panel_store is not None:
+            data = panel_store.read_series(csv_file_path).sort_index(ascending=True)
+        else:
+            data = (pd.read_csv(csv_file_path, parse_dates=[args.timestamp_column], header=0)
+                    .set_index(args.timestamp_column)
+                    .sort_index(ascending=True))
 
         # 2.0 Split the data into train and test sets
         train = data[:-args.test_size]
@@ -81,8 +116,10 @@ def run(input_data):
             lagger = SimpleLagger(args.target_column, lag_orders=[1, 2, 3, 4])
             transform_steps = [('column_dropper', ColumnDropper(args.drop_columns)),
                                ('calendar_featurizer', SimpleCalendarFeaturizer()), ('lagger', lagger)]
+            max_horizon = args.max_horizon if args.max_horizon is not None else args.test_size
             forecaster = SimpleForecaster(transform_steps, LinearRegression(), args.target_column,
-                                          args.timestamp_column)
+                                          args.timestamp_column, forecast_strategy=args.forecast_strategy,
+                                          max_horizon=max_horizon)
             forecaster.fit(train)
             print('Featurized data example:')
             print(forecaster.transform(train).head())